@@ -1,17 +1,16 @@
 import streamlit as st
-from datetime import date, timedelta
+from datetime import date
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from models import (
-    init_db, create_plan, add_tasks, get_tasks_by_date,
+    init_db, get_tasks_by_date,
     update_task_status, get_progress_counts, get_all_tasks,
-    reset_all_data, get_latest_plan_id, get_all_tasks_detailed
+    reset_all_data, get_latest_plan_id, get_all_tasks_detailed, get_job
 )
 
-from planner_hf import generate_plan_hf
-from planner_fallback import generate_plan_fallback
+from jobs import get_job_queue, is_job_stalled, ACTIVE_JOB_STATUSES, JOB_POLL_SECONDS
 from progress import compute_days_left, compute_status
 
 
@@ -22,137 +21,14 @@ st.title("AI Study Plan Generator & Tracker (Hugging Face)")
 
 if "plan_id" not in st.session_state:
     st.session_state.plan_id = get_latest_plan_id()
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
 
+# Plan generation runs in a background job; pick up its plan once it finishes.
+job = get_job(st.session_state.job_id) if st.session_state.job_id else None
+if job and job["status"] == "done" and st.session_state.plan_id != job["plan_id"]:
+    st.session_state.plan_id = job["plan_id"]
 
-def get_revision_days(duration_days: int) -> int:
-    rev = round(duration_days * 0.10)
-    return max(2, min(14, int(rev)))
-
-
-def convert_plan_to_tasks(ai_plan, start_date: date, duration_days: int, intensity: str, preferred_days: list, goal_type: str):
-    # intensity -> minutes
-    mins = 75
-    if intensity == "light":
-        mins = 55
-    elif intensity == "intensive":
-        mins = 105
-
-    # preferred days mapping
-    day_map = {"Mon": 0, "Tue": 1, "Wed": 2, "Thu": 3, "Fri": 4, "Sat": 5, "Sun": 6}
-    preferred_idx = set(day_map[d] for d in preferred_days) if preferred_days else set(range(7))
-
-    # dynamic revision window: 10% of duration, min 2, max 14
-    revision_days = max(2, min(14, int(round(duration_days * 0.10))))
-
-    weeks = ai_plan.get("weeks", [])
-    if not weeks:
-        weeks = [{"week_no": 1, "milestone": "Foundations", "subtopics": ["Basics", "Core concepts", "Practice", "Revision"]}]
-
-    def get_week_obj(week_no: int):
-        return next((w for w in weeks if int(w.get("week_no", 1)) == week_no), None)
-
-    def looks_generic(subtopics: list) -> bool:
-        generic_keywords = [
-            "fundamentals", "core theory", "terminology", "types", "categories",
-            "examples", "applications", "faqs", "common mistakes", "overview",
-            "key concepts", "important points", "practice set", "quick revision"
-        ]
-        text = " ".join(s.lower() for s in (subtopics or []))
-        return any(k in text for k in generic_keywords)
-
-    tasks = []
-
-    for day_offset in range(duration_days):
-        d = start_date + timedelta(days=day_offset)
-        if d.weekday() not in preferred_idx:
-            continue
-
-        week_no = (day_offset // 7) + 1
-        week_obj = get_week_obj(week_no)
-
-        milestone = (week_obj.get("milestone") if week_obj else f"Week {week_no} milestone")
-        subtopics = (week_obj.get("subtopics") if week_obj else [])
-
-        # If subtopics are missing or too generic, generate a goal-type-aware fallback subtopic list
-        if not subtopics or looks_generic(subtopics):
-            if goal_type == "Exam preparation":
-                subtopics = [
-                    f"{milestone} - Key concepts & notes",
-                    f"{milestone} - High-yield points",
-                    f"{milestone} - PYQ practice",
-                    f"{milestone} - Mock-style questions",
-                    f"{milestone} - Revision & recall",
-                ]
-            elif goal_type == "Certification":
-                subtopics = [
-                    f"{milestone} - Concepts for exam objectives",
-                    f"{milestone} - Hands-on labs/tasks",
-                    f"{milestone} - Scenario-based questions",
-                    f"{milestone} - Practice test set",
-                    f"{milestone} - Review weak areas",
-                ]
-            else:  # Skill/topic completion
-                subtopics = [
-                    f"{milestone} - Learn core concepts",
-                    f"{milestone} - Guided implementation",
-                    f"{milestone} - Mini-exercise / coding task",
-                    f"{milestone} - Build a small project piece",
-                    f"{milestone} - Debug + reflect + improve",
-                ]
-
-        # Count how many tasks already assigned in this week (handles skipped days)
-        week_start = (week_no - 1) * 7
-        prior_in_week = 0
-        for t in tasks:
-            td = date.fromisoformat(t["task_date"])
-            offset = (td - start_date).days
-            if week_start <= offset < week_start + 7:
-                prior_in_week += 1
-
-        subtopic = subtopics[prior_in_week % len(subtopics)]
-
-        # Task labeling + details based on goal type
-        if day_offset >= duration_days - revision_days:
-            # Revision period
-            title = "Revision & Mock Practice" if goal_type != "Skill/topic completion" else "Review & Improve"
-
-            if goal_type == "Exam preparation":
-                details = f"Revise: {subtopic} + timed PYQs/mock + analyze mistakes."
-            elif goal_type == "Certification":
-                details = f"Revise: {subtopic} + practice test + review weak areas."
-            else:
-                details = f"Review: {subtopic} + refactor + fix gaps + summarize learnings."
-
-        else:
-            cycle = prior_in_week % 5
-
-            if cycle in [0, 1]:
-                title = f"Learn: {subtopic}"
-                details = "Learn concepts + make short notes." if goal_type != "Skill/topic completion" else "Learn + follow a guided example."
-
-            elif cycle in [2, 3]:
-                title = f"Practice: {subtopic}"
-
-                if goal_type == "Exam preparation":
-                    details = "Solve PYQs + practice questions + review errors."
-                elif goal_type == "Certification":
-                    details = "Do hands-on tasks + scenario questions + review errors."
-                else:
-                    details = "Implement/coding task + test + fix bugs."
-
-            else:
-                title = f"Revise: {subtopic}" if goal_type != "Skill/topic completion" else f"Improve: {subtopic}"
-                details = "Quick revision + 10-minute recall test." if goal_type != "Skill/topic completion" else "Improve solution + clean code + add notes."
-
-        tasks.append({
-            "task_date": d.isoformat(),
-            "week_no": week_no,
-            "title": title,
-            "details": details,
-            "estimated_minutes": mins
-        })
-
-    return tasks
 
 tab1, tab2, tab3, tab4 = st.tabs(["Create Plan", "Tasks", "Dashboard", "Full Plan"])
 
@@ -164,6 +40,8 @@ with tab1:
         if st.button("Start New Plan (Reset)", use_container_width=True):
             reset_all_data()
             st.session_state.plan_id = None
+            st.session_state.job_id = None
+            job = None
             st.success("Old plan cleared. Create a new plan now")
 
     col1, col2 = st.columns(2)
@@ -184,55 +62,57 @@ with tab1:
         intensity = st.selectbox("Study intensity", ["light", "moderate", "intensive"], index=1)
         learning_pref = st.selectbox("Learning preference", ["reading", "practice", "mixed"], index=2)
 
-    if st.button("Generate Plan", use_container_width=True):
+    # A job whose worker stopped updating it (process restart, storage error)
+    # must not lock the button forever; resubmitting replaces it.
+    job_active = job is not None and job["status"] in ACTIVE_JOB_STATUSES and not is_job_stalled(job)
+
+    if st.button("Generate Plan", use_container_width=True, disabled=job_active):
         if not goal.strip():
             st.error("Please enter a learning goal/subject.")
         else:
-            goal_for_ai = f"{goal} ({goal_type})"
-            end_date = start_date + timedelta(days=int(duration_days))
-
-            plan_id = create_plan({
-                "goal": goal_for_ai,
+            # Repeated clicks while the same inputs are in flight resolve to that job.
+            st.session_state.job_id = get_job_queue().submit({
+                "goal": goal.strip(),
+                "goal_type": goal_type,
                 "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
                 "duration_days": int(duration_days),
                 "hours_per_week": float(hours_per_week),
-                "preferred_days": ",".join(preferred_days),
+                "preferred_days": preferred_days,
                 "intensity": intensity,
                 "learning_pref": learning_pref
             })
-            st.session_state.plan_id = plan_id
-
-            planner_used = "Hugging Face"
-            ai_error = None
-
-            try:
-                ai_plan = generate_plan_hf(goal_for_ai, int(duration_days), float(hours_per_week), intensity, learning_pref)
-            except Exception as e:
-                planner_used = "Fallback"
-                ai_error = str(e)
-                ai_plan = generate_plan_fallback(goal_for_ai, int(duration_days), intensity=intensity)
-
-            st.caption(f"Planner used: **{planner_used}**")
-            if ai_error:
-                st.caption(f"⚠️ AI error (why fallback): {ai_error[:180]}")
-
-            tasks = convert_plan_to_tasks(
-                ai_plan,
-                start_date,
-                int(duration_days),
-                intensity=intensity,
-                preferred_days=preferred_days,
-                goal_type=goal_type
-            )
-
-            add_tasks(plan_id, tasks)
+            st.rerun()
+
+    @st.fragment(run_every=JOB_POLL_SECONDS if job_active else None)
+    def show_job_status():
+        current = get_job(st.session_state.job_id) if st.session_state.job_id else None
+        if current is None:
+            return
+
+        if is_job_stalled(current):
+            if job_active:
+                # Went stale since the last full run: re-enable the button.
+                st.rerun()
+            st.warning("Plan generation stopped responding. Click **Generate Plan** to try again.")
+        elif current["status"] in ACTIVE_JOB_STATUSES:
+            st.info(f"⏳ {current['stage']}… You can keep using the other tabs meanwhile.")
+        elif job_active:
+            # Finished since the last full run: refresh every tab once.
+            st.rerun()
+        elif current["status"] == "failed":
+            st.error(f"Plan generation failed: {(current['message'] or '')[:180]}")
+        else:
+            st.caption(f"Planner used: **{current['planner_used']}**")
+            if current["message"]:
+                st.caption(f"⚠️ AI error (why fallback): {current['message'][:180]}")
 
             st.success("Plan created successfully!")
 
             st.write("### Plan Preview (First 10 Tasks)")
-            for t in tasks[:10]:
-                st.write(f"- {t['task_date']} | Week {t['week_no']} | {t['title']} (~{t['estimated_minutes']} mins)")
+            for _, task_date, week_no, title, _, mins, _ in get_all_tasks_detailed(current["plan_id"])[:10]:
+                st.write(f"- {task_date} | Week {week_no} | {title} (~{mins} mins)")
+
+    show_job_status()
 
 
 with tab2:
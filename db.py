@@ -1,6 +1,20 @@
+import os
 import sqlite3
 
 DB_NAME = "study_plan.db"
 
-def get_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+# Storage backend: "sqlite" (local file, default) or "postgres" (shared server,
+# for running several app instances). See storage.py.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").strip().lower()
+DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+# Seconds to wait for a free pooled connection before giving up.
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+
+# Opt-in compact task layout: INTEGER rowid keys, epoch-day dates and
+# enum-coded status (see storage_sqlite.py). Set COMPACT_TASKS=1 in .env to enable.
+COMPACT_TASKS = os.getenv("COMPACT_TASKS", "").strip().lower() in ("1", "true", "yes")
+
+def get_connection(db_name: str = DB_NAME):
+    return sqlite3.connect(db_name, check_same_thread=False)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from models import create_job, update_job, finish_plan_job
+from planner_hf import generate_plan_hf
+from planner_fallback import generate_plan_fallback
+from planner_tasks import convert_plan_to_tasks
+
+logger = logging.getLogger(__name__)
+
+# Plan generation is dominated by the HF request, so threads are enough.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Queued/running jobs not updated for this long (e.g. the worker's process
+# restarted) count as stalled: the UI offers a retry and a resubmission with
+# the same inputs replaces them.
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+# A finished job still absorbs identical submissions for this long (double
+# clicks); after that the same inputs generate a fresh plan.
+JOB_DEDUPE_SECONDS = int(os.getenv("JOB_DEDUPE_SECONDS", "10"))
+# Pause before retrying a failed "mark as failed" write.
+JOB_FAILURE_RETRY_SECONDS = 1
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+# How often the UI re-checks a running job.
+JOB_POLL_SECONDS = 1.5
+
+
+def make_idempotency_key(request: dict) -> str:
+    """Identical form submissions map to the same key (and so dedupe to one job)."""
+    payload = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_job_stalled(job: dict) -> bool:
+    """True for a queued/running job whose worker has stopped updating it."""
+    stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    return job["status"] in ACTIVE_JOB_STATUSES and job["updated_at"] < stale_before
+
+
+def _mark_failed(job_id: str, message: str):
+    # Runs inside the executor, which would swallow an exception here; retry
+    # once so a transient storage error (e.g. a locked database) does not
+    # leave the job active. If both attempts fail, the UI's stall check
+    # still lets the user retry.
+    for attempt in (1, 2):
+        try:
+            update_job(job_id, "failed", "Failed", message=message)
+            return
+        except Exception:
+            logger.exception("Could not mark job %s as failed (attempt %d)", job_id, attempt)
+            if attempt == 1:
+                time.sleep(JOB_FAILURE_RETRY_SECONDS)
+
+
+def run_plan_job(job_id: str, request: dict):
+    """Generate a plan and its tasks, recording progress on the job row."""
+    try:
+        goal_for_ai = f"{request['goal']} ({request['goal_type']})"
+        start_date = date.fromisoformat(request["start_date"])
+        duration_days = int(request["duration_days"])
+        end_date = start_date + timedelta(days=duration_days)
+
+        # Every update is conditional on the job still being queued/running;
+        # stop as soon as it has been reset or replaced by a resubmission.
+        if not update_job(job_id, "running", "Generating plan with AI"):
+            return
+        planner_used = "Hugging Face"
+        ai_error = None
+        try:
+            ai_plan = generate_plan_hf(goal_for_ai, duration_days, float(request["hours_per_week"]),
+                                       request["intensity"], request["learning_pref"])
+        except Exception as e:
+            planner_used = "Fallback"
+            ai_error = str(e)
+            ai_plan = generate_plan_fallback(goal_for_ai, duration_days, intensity=request["intensity"])
+
+        if not update_job(job_id, "running", "Saving tasks", planner_used=planner_used):
+            return
+        tasks = convert_plan_to_tasks(
+            ai_plan,
+            start_date,
+            duration_days,
+            intensity=request["intensity"],
+            preferred_days=request["preferred_days"],
+            goal_type=request["goal_type"]
+        )
+
+        # Plan, tasks and the job's done state commit together, so nobody sees
+        # a half-built plan and a job that lost its claim writes nothing.
+        finish_plan_job(job_id, {
+            "goal": goal_for_ai,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "duration_days": duration_days,
+            "hours_per_week": float(request["hours_per_week"]),
+            "preferred_days": ",".join(request["preferred_days"]),
+            "intensity": request["intensity"],
+            "learning_pref": request["learning_pref"]
+        }, tasks, message=ai_error)
+    except Exception as e:
+        _mark_failed(job_id, str(e))
+
+
+class PlanJobQueue:
+    """In-process worker pool for plan generation; job state lives in storage."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+
+    def submit(self, request: dict) -> str:
+        """Queue a plan request and return its job_id; in-flight duplicates return the existing job."""
+        now = datetime.utcnow()
+        job_id, created = create_job(make_idempotency_key(request), json.dumps(request),
+                                     now - timedelta(seconds=JOB_STALE_SECONDS),
+                                     now - timedelta(seconds=JOB_DEDUPE_SECONDS))
+        if created:
+            self.executor.submit(run_plan_job, job_id, request)
+        return job_id
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> PlanJobQueue:
+    """Return the process-wide queue (shared across Streamlit sessions and reruns)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PlanJobQueue()
+        return _queue
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+
+def get_revision_days(duration_days: int) -> int:
+    rev = round(duration_days * 0.10)
+    return max(2, min(14, int(rev)))
+
+
+def convert_plan_to_tasks(ai_plan, start_date: date, duration_days: int, intensity: str, preferred_days: list, goal_type: str):
+    # intensity -> minutes
+    mins = 75
+    if intensity == "light":
+        mins = 55
+    elif intensity == "intensive":
+        mins = 105
+
+    # preferred days mapping
+    day_map = {"Mon": 0, "Tue": 1, "Wed": 2, "Thu": 3, "Fri": 4, "Sat": 5, "Sun": 6}
+    preferred_idx = set(day_map[d] for d in preferred_days) if preferred_days else set(range(7))
+
+    # dynamic revision window: 10% of duration, min 2, max 14
+    revision_days = max(2, min(14, int(round(duration_days * 0.10))))
+
+    weeks = ai_plan.get("weeks", [])
+    if not weeks:
+        weeks = [{"week_no": 1, "milestone": "Foundations", "subtopics": ["Basics", "Core concepts", "Practice", "Revision"]}]
+
+    def get_week_obj(week_no: int):
+        return next((w for w in weeks if int(w.get("week_no", 1)) == week_no), None)
+
+    def looks_generic(subtopics: list) -> bool:
+        generic_keywords = [
+            "fundamentals", "core theory", "terminology", "types", "categories",
+            "examples", "applications", "faqs", "common mistakes", "overview",
+            "key concepts", "important points", "practice set", "quick revision"
+        ]
+        text = " ".join(s.lower() for s in (subtopics or []))
+        return any(k in text for k in generic_keywords)
+
+    tasks = []
+    week_counts = {}
+
+    for day_offset in range(duration_days):
+        d = start_date + timedelta(days=day_offset)
+        if d.weekday() not in preferred_idx:
+            continue
+
+        week_no = (day_offset // 7) + 1
+        week_obj = get_week_obj(week_no)
+
+        milestone = (week_obj.get("milestone") if week_obj else f"Week {week_no} milestone")
+        subtopics = (week_obj.get("subtopics") if week_obj else [])
+
+        # If subtopics are missing or too generic, generate a goal-type-aware fallback subtopic list
+        if not subtopics or looks_generic(subtopics):
+            if goal_type == "Exam preparation":
+                subtopics = [
+                    f"{milestone} - Key concepts & notes",
+                    f"{milestone} - High-yield points",
+                    f"{milestone} - PYQ practice",
+                    f"{milestone} - Mock-style questions",
+                    f"{milestone} - Revision & recall",
+                ]
+            elif goal_type == "Certification":
+                subtopics = [
+                    f"{milestone} - Concepts for exam objectives",
+                    f"{milestone} - Hands-on labs/tasks",
+                    f"{milestone} - Scenario-based questions",
+                    f"{milestone} - Practice test set",
+                    f"{milestone} - Review weak areas",
+                ]
+            else:  # Skill/topic completion
+                subtopics = [
+                    f"{milestone} - Learn core concepts",
+                    f"{milestone} - Guided implementation",
+                    f"{milestone} - Mini-exercise / coding task",
+                    f"{milestone} - Build a small project piece",
+                    f"{milestone} - Debug + reflect + improve",
+                ]
+
+        # Count how many tasks already assigned in this week (handles skipped days)
+        prior_in_week = week_counts.get(week_no, 0)
+        week_counts[week_no] = prior_in_week + 1
+
+        subtopic = subtopics[prior_in_week % len(subtopics)]
+
+        # Task labeling + details based on goal type
+        if day_offset >= duration_days - revision_days:
+            # Revision period
+            title = "Revision & Mock Practice" if goal_type != "Skill/topic completion" else "Review & Improve"
+
+            if goal_type == "Exam preparation":
+                details = f"Revise: {subtopic} + timed PYQs/mock + analyze mistakes."
+            elif goal_type == "Certification":
+                details = f"Revise: {subtopic} + practice test + review weak areas."
+            else:
+                details = f"Review: {subtopic} + refactor + fix gaps + summarize learnings."
+
+        else:
+            cycle = prior_in_week % 5
+
+            if cycle in [0, 1]:
+                title = f"Learn: {subtopic}"
+                details = "Learn concepts + make short notes." if goal_type != "Skill/topic completion" else "Learn + follow a guided example."
+
+            elif cycle in [2, 3]:
+                title = f"Practice: {subtopic}"
+
+                if goal_type == "Exam preparation":
+                    details = "Solve PYQs + practice questions + review errors."
+                elif goal_type == "Certification":
+                    details = "Do hands-on tasks + scenario questions + review errors."
+                else:
+                    details = "Implement/coding task + test + fix bugs."
+
+            else:
+                title = f"Revise: {subtopic}" if goal_type != "Skill/topic completion" else f"Improve: {subtopic}"
+                details = "Quick revision + 10-minute recall test." if goal_type != "Skill/topic completion" else "Improve solution + clean code + add notes."
+
+        tasks.append({
+            "task_date": d.isoformat(),
+            "week_no": week_no,
+            "title": title,
+            "details": details,
+            "estimated_minutes": mins
+        })
+
+    return tasks
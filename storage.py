@@ -0,0 +1,104 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from db import STORAGE_BACKEND
+
+# Shared status coding for backends that store status as an integer.
+STATUS_CODES = {"pending": 0, "done": 1}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+JOB_FIELDS = ("job_id", "status", "stage", "plan_id", "planner_used", "message", "updated_at")
+
+
+class Storage(ABC):
+    """Persistence interface behind models.py.
+
+    Every backend returns the same row shapes: task_id as a string, task_date
+    as an ISO date string and status as "pending" / "done".
+    """
+
+    @abstractmethod
+    def init_db(self):
+        ...
+
+    @abstractmethod
+    def reset_all_data(self):
+        ...
+
+    @abstractmethod
+    def get_latest_plan_id(self):
+        ...
+
+    @abstractmethod
+    def create_plan(self, plan_data: dict) -> str:
+        ...
+
+    @abstractmethod
+    def add_tasks(self, plan_id: str, tasks: list):
+        ...
+
+    @abstractmethod
+    def get_tasks_by_date(self, plan_id: str, date_str: str):
+        """Rows of (task_id, title, details, estimated_minutes, status)."""
+
+    @abstractmethod
+    def get_all_tasks(self, plan_id: str):
+        """Rows of (task_id, task_date, week_no, title, status)."""
+
+    @abstractmethod
+    def update_task_status(self, task_id: str, status: str):
+        ...
+
+    @abstractmethod
+    def get_progress_counts(self, plan_id: str):
+        """(total, done) task counts."""
+
+    @abstractmethod
+    def get_all_tasks_detailed(self, plan_id: str):
+        """Rows of (task_id, task_date, week_no, title, details, estimated_minutes, status)."""
+
+    @abstractmethod
+    def create_job(self, idempotency_key: str, request_json: str, stale_before: datetime, done_before: datetime):
+        """Queue a job unless a duplicate is in flight; return (job_id, created).
+
+        Only queued/running jobs updated since stale_before, and done jobs
+        finished since done_before, count as duplicates. Any other job with the
+        same key is replaced, so the request can be run again.
+        """
+
+    @abstractmethod
+    def get_job(self, job_id: str):
+        """Dict of JOB_FIELDS (updated_at as a naive UTC datetime); None if missing."""
+
+    @abstractmethod
+    def update_job(self, job_id: str, status: str, stage: str, planner_used=None, message=None) -> bool:
+        """Set status/stage of a queued/running job; False if it is gone or finished."""
+
+    @abstractmethod
+    def finish_plan_job(self, job_id: str, plan_data: dict, tasks: list, message=None):
+        """Atomically mark the job done and write its plan and tasks.
+
+        Returns the new plan_id, or None (writing nothing) if the job is no
+        longer queued/running, e.g. after a reset or a stale replacement.
+        """
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> Storage:
+    """Return the process-wide backend selected by STORAGE_BACKEND."""
+    global _storage
+    with _storage_lock:
+        if _storage is not None:
+            return _storage
+        if STORAGE_BACKEND == "sqlite":
+            from storage_sqlite import SQLiteStorage
+            _storage = SQLiteStorage()
+        elif STORAGE_BACKEND in ("postgres", "postgresql"):
+            from storage_postgres import PostgresStorage
+            _storage = PostgresStorage()
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r} (expected 'sqlite' or 'postgres').")
+        return _storage
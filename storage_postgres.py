@@ -0,0 +1,300 @@
+import io
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from db import DATABASE_URL, PG_POOL_MIN, PG_POOL_MAX, PG_POOL_TIMEOUT
+from storage import Storage, STATUS_CODES, STATUS_NAMES, JOB_FIELDS
+
+# Arbitrary key for the advisory lock that serializes schema creation when
+# several app instances start at once.
+SCHEMA_LOCK_KEY = 727001
+
+
+def _copy_field(value) -> str:
+    """Encode one value for COPY's text format (\\N is NULL, so "" stays "")."""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class PostgresStorage(Storage):
+    """Shared server backend so several app instances can use the same data.
+
+    Uses a thread-safe connection pool (callers wait up to PG_POOL_TIMEOUT for
+    a free connection) and COPY for bulk task inserts. Tasks use
+    native types (BIGSERIAL id, DATE, SMALLINT status); rows are converted back
+    to the same shapes the SQLite backend returns.
+    """
+
+    def __init__(self, dsn: str = DATABASE_URL, minconn: int = PG_POOL_MIN, maxconn: int = PG_POOL_MAX,
+                 timeout: float = PG_POOL_TIMEOUT):
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs psycopg2: pip install psycopg2-binary") from e
+        if not dsn:
+            raise RuntimeError("DATABASE_URL is missing. Add it to .env (local) or Streamlit Secrets (cloud).")
+        self.pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        # getconn() raises PoolError as soon as the pool is exhausted, so gate
+        # it with a semaphore to make extra callers wait for a free connection.
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+        self.initialized = False
+        self.init_lock = threading.Lock()
+
+    @contextmanager
+    def _cursor(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"No free database connection after {self.timeout}s; raise PG_POOL_MAX.")
+        try:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self.pool.putconn(conn)
+        finally:
+            self.slots.release()
+
+    def init_db(self):
+        # init_db runs on every Streamlit rerun, and the DDL takes the global
+        # advisory lock plus a SHARE lock on tasks. Run it once per process and
+        # only if the schema is missing (jobs is created last).
+        with self.init_lock:
+            if self.initialized:
+                return
+            with self._cursor() as cur:
+                cur.execute("SELECT to_regclass('jobs')")
+                if cur.fetchone()[0] is None:
+                    self._create_schema(cur)
+            self.initialized = True
+
+    def _create_schema(self, cur):
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_KEY,))
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS plans (
+            plan_id TEXT PRIMARY KEY,
+            goal TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            duration_days INTEGER,
+            hours_per_week REAL,
+            preferred_days TEXT,
+            intensity TEXT,
+            learning_pref TEXT,
+            created_at TIMESTAMP
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id BIGSERIAL PRIMARY KEY,
+            plan_id TEXT,
+            task_date DATE,
+            week_no INTEGER,
+            title TEXT,
+            details TEXT,
+            estimated_minutes INTEGER,
+            status SMALLINT,
+            completed_at TIMESTAMP
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_plan_date ON tasks(plan_id, task_date)")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            idempotency_key TEXT UNIQUE,
+            status TEXT,
+            stage TEXT,
+            request TEXT,
+            plan_id TEXT,
+            planner_used TEXT,
+            message TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """)
+
+    def reset_all_data(self):
+        """One-plan mode: clear everything."""
+        with self._cursor() as cur:
+            cur.execute("TRUNCATE tasks, plans, jobs")
+
+    def get_latest_plan_id(self):
+        with self._cursor() as cur:
+            cur.execute("SELECT plan_id FROM plans ORDER BY created_at DESC LIMIT 1")
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def create_plan(self, plan_data: dict) -> str:
+        with self._cursor() as cur:
+            plan_id = self._insert_plan(cur, plan_data)
+        return plan_id
+
+    def add_tasks(self, plan_id: str, tasks: list):
+        with self._cursor() as cur:
+            self._insert_tasks(cur, plan_id, tasks)
+
+    def _insert_plan(self, cur, plan_data: dict, plan_id=None) -> str:
+        plan_id = plan_id or str(uuid.uuid4())
+        cur.execute("""
+            INSERT INTO plans(plan_id, goal, start_date, end_date, duration_days,
+                              hours_per_week, preferred_days, intensity, learning_pref, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            plan_id,
+            plan_data["goal"],
+            plan_data["start_date"],
+            plan_data["end_date"],
+            plan_data["duration_days"],
+            plan_data["hours_per_week"],
+            plan_data["preferred_days"],
+            plan_data["intensity"],
+            plan_data["learning_pref"],
+            datetime.utcnow()
+        ))
+        return plan_id
+
+    def _insert_tasks(self, cur, plan_id: str, tasks: list):
+        # Stream all rows through one COPY instead of an INSERT per task.
+        buf = io.StringIO()
+        pending = STATUS_CODES["pending"]
+        for t in tasks:
+            buf.write("\t".join(_copy_field(v) for v in (
+                plan_id,
+                t["task_date"],
+                t["week_no"],
+                t["title"],
+                t["details"],
+                t["estimated_minutes"],
+                pending,
+            )) + "\n")
+        buf.seek(0)
+        cur.copy_expert("""
+            COPY tasks(plan_id, task_date, week_no, title, details, estimated_minutes, status)
+            FROM STDIN
+        """, buf)
+
+    def get_tasks_by_date(self, plan_id: str, date_str: str):
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT task_id, title, details, estimated_minutes, status
+                FROM tasks
+                WHERE plan_id=%s AND task_date=%s
+                ORDER BY week_no ASC, title ASC
+            """, (plan_id, date.fromisoformat(date_str)))
+            rows = cur.fetchall()
+        return [
+            (str(task_id), title, details, mins, STATUS_NAMES[status])
+            for task_id, title, details, mins, status in rows
+        ]
+
+    def get_all_tasks(self, plan_id: str):
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT task_id, task_date, week_no, title, status
+                FROM tasks
+                WHERE plan_id=%s
+                ORDER BY task_date ASC
+            """, (plan_id,))
+            rows = cur.fetchall()
+        return [
+            (str(task_id), task_date.isoformat(), week_no, title, STATUS_NAMES[status])
+            for task_id, task_date, week_no, title, status in rows
+        ]
+
+    def update_task_status(self, task_id: str, status: str):
+        completed_at = datetime.utcnow() if status == "done" else None
+        with self._cursor() as cur:
+            cur.execute("""
+                UPDATE tasks SET status=%s, completed_at=%s
+                WHERE task_id=%s
+            """, (STATUS_CODES[status], completed_at, int(task_id)))
+
+    def get_progress_counts(self, plan_id: str):
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE status=%s)
+                FROM tasks WHERE plan_id=%s
+            """, (STATUS_CODES["done"], plan_id))
+            total, done = cur.fetchone()
+        return total, done
+
+    def get_all_tasks_detailed(self, plan_id: str):
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT task_id, task_date, week_no, title, details, estimated_minutes, status
+                FROM tasks
+                WHERE plan_id=%s
+                ORDER BY task_date ASC
+            """, (plan_id,))
+            rows = cur.fetchall()
+        return [
+            (str(task_id), task_date.isoformat(), week_no, title, details, mins, STATUS_NAMES[status])
+            for task_id, task_date, week_no, title, details, mins, status in rows
+        ]
+
+    def create_job(self, idempotency_key: str, request_json: str, stale_before: datetime, done_before: datetime):
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        with self._cursor() as cur:
+            cur.execute("""
+                DELETE FROM jobs
+                WHERE idempotency_key=%s
+                  AND NOT (status IN ('queued', 'running') AND updated_at >= %s)
+                  AND NOT (status='done' AND updated_at >= %s)
+            """, (idempotency_key, stale_before, done_before))
+            cur.execute("""
+                INSERT INTO jobs(job_id, idempotency_key, status, stage, request, created_at, updated_at)
+                VALUES (%s, %s, 'queued', 'Queued', %s, %s, %s)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                RETURNING job_id
+            """, (job_id, idempotency_key, request_json, now, now))
+            created = cur.fetchone() is not None
+            if not created:
+                cur.execute("SELECT job_id FROM jobs WHERE idempotency_key=%s", (idempotency_key,))
+                job_id = cur.fetchone()[0]
+        return job_id, created
+
+    def get_job(self, job_id: str):
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT job_id, status, stage, plan_id, planner_used, message, updated_at
+                FROM jobs WHERE job_id=%s
+            """, (job_id,))
+            row = cur.fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row else None
+
+    def update_job(self, job_id: str, status: str, stage: str, planner_used=None, message=None) -> bool:
+        with self._cursor() as cur:
+            cur.execute("""
+                UPDATE jobs SET status=%s, stage=%s,
+                    planner_used=COALESCE(%s, planner_used),
+                    message=COALESCE(%s, message),
+                    updated_at=%s
+                WHERE job_id=%s AND status IN ('queued', 'running')
+            """, (status, stage, planner_used, message, datetime.utcnow(), job_id))
+            updated = cur.rowcount == 1
+        return updated
+
+    def finish_plan_job(self, job_id: str, plan_data: dict, tasks: list, message=None):
+        plan_id = str(uuid.uuid4())
+        with self._cursor() as cur:
+            # Claim the job first (row lock); if it was reset or replaced meanwhile, write nothing.
+            cur.execute("""
+                UPDATE jobs SET status='done', stage='Done', plan_id=%s,
+                    message=COALESCE(%s, message),
+                    updated_at=%s
+                WHERE job_id=%s AND status IN ('queued', 'running')
+            """, (plan_id, message, datetime.utcnow(), job_id))
+            if cur.rowcount != 1:
+                return None
+            self._insert_plan(cur, plan_data, plan_id)
+            self._insert_tasks(cur, plan_id, tasks)
+        return plan_id
@@ -0,0 +1,436 @@
+from db import get_connection, DB_NAME, COMPACT_TASKS
+from datetime import date, datetime, timezone
+from functools import lru_cache
+import uuid
+
+from storage import Storage, STATUS_CODES, STATUS_NAMES, JOB_FIELDS
+
+# Compact layout codecs: dates are stored as days since 1970-01-01,
+# completed_at as UTC epoch seconds, status as a small integer, and the plan
+# as an integer key from plan_keys instead of the 36-char UUID.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _to_epoch_day(date_str: str) -> int:
+    return date.fromisoformat(date_str).toordinal() - EPOCH_ORDINAL
+
+@lru_cache(maxsize=4096)
+def _from_epoch_day(day: int) -> str:
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def _to_epoch_seconds(iso: str):
+    if iso is None:
+        return None
+    return int(datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp())
+
+def _from_epoch_seconds(seconds):
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class SQLiteStorage(Storage):
+    """Local single-file backend (study_plan.db)."""
+
+    def __init__(self, db_name: str = DB_NAME, compact: bool = COMPACT_TASKS):
+        self.db_name = db_name
+        self.compact = compact
+
+    def init_db(self):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS plans (
+            plan_id TEXT PRIMARY KEY,
+            goal TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            duration_days INTEGER,
+            hours_per_week REAL,
+            preferred_days TEXT,
+            intensity TEXT,
+            learning_pref TEXT,
+            created_at TEXT
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            plan_id TEXT,
+            task_date TEXT,
+            week_no INTEGER,
+            title TEXT,
+            details TEXT,
+            estimated_minutes INTEGER,
+            status TEXT,
+            completed_at TEXT
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            idempotency_key TEXT UNIQUE,
+            status TEXT,
+            stage TEXT,
+            request TEXT,
+            plan_id TEXT,
+            planner_used TEXT,
+            message TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+        """)
+
+        # Both task layouts always exist so switching COMPACT_TASKS never
+        # hides or orphans rows; _migrate_tasks moves them to the active one.
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS plan_keys (
+            plan_no INTEGER PRIMARY KEY,
+            plan_id TEXT UNIQUE
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_compact (
+            task_id INTEGER PRIMARY KEY,
+            plan_no INTEGER,
+            task_day INTEGER,
+            week_no INTEGER,
+            title TEXT,
+            details TEXT,
+            estimated_minutes INTEGER,
+            status INTEGER,
+            completed_at INTEGER
+        )
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_compact_plan_day
+        ON tasks_compact(plan_no, task_day)
+        """)
+
+        self._migrate_tasks(conn)
+
+        conn.commit()
+        conn.close()
+
+    def _migrate_tasks(self, conn):
+        """Move task rows written under the other COMPACT_TASKS setting into the active layout."""
+        cur = conn.cursor()
+        # init_db runs on every Streamlit rerun: only take the write lock when
+        # the inactive table actually has rows to move.
+        inactive = "tasks" if self.compact else "tasks_compact"
+        cur.execute(f"SELECT EXISTS(SELECT 1 FROM {inactive})")
+        if not cur.fetchone()[0]:
+            return
+        if self.compact:
+            cur.execute("INSERT OR IGNORE INTO plan_keys(plan_id) SELECT DISTINCT plan_id FROM tasks")
+            old_rows = conn.execute("""
+                SELECT k.plan_no, t.task_date, t.week_no, t.title, t.details,
+                       t.estimated_minutes, t.status, t.completed_at
+                FROM tasks t JOIN plan_keys k ON k.plan_id = t.plan_id
+            """)
+            cur.executemany("""
+                INSERT INTO tasks_compact(plan_no, task_day, week_no, title, details,
+                                          estimated_minutes, status, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                (plan_no, _to_epoch_day(task_date), week_no, title, details, mins,
+                 STATUS_CODES[status], _to_epoch_seconds(completed_at))
+                for plan_no, task_date, week_no, title, details, mins, status, completed_at in old_rows
+            ))
+            cur.execute("DELETE FROM tasks")
+        else:
+            old_rows = conn.execute("""
+                SELECT k.plan_id, c.task_day, c.week_no, c.title, c.details,
+                       c.estimated_minutes, c.status, c.completed_at
+                FROM tasks_compact c JOIN plan_keys k ON k.plan_no = c.plan_no
+            """)
+            cur.executemany("""
+                INSERT INTO tasks(task_id, plan_id, task_date, week_no, title, details,
+                                  estimated_minutes, status, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                (str(uuid.uuid4()), plan_id, _from_epoch_day(day), week_no, title, details, mins,
+                 STATUS_NAMES[status], _from_epoch_seconds(completed_at))
+                for plan_id, day, week_no, title, details, mins, status, completed_at in old_rows
+            ))
+            cur.execute("DELETE FROM tasks_compact")
+
+    def reset_all_data(self):
+        """One-plan mode: clear everything."""
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        cur.execute("DELETE FROM tasks")
+        cur.execute("DELETE FROM tasks_compact")
+        cur.execute("DELETE FROM plan_keys")
+        cur.execute("DELETE FROM plans")
+        cur.execute("DELETE FROM jobs")
+        conn.commit()
+        conn.close()
+
+    def get_latest_plan_id(self):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        cur.execute("SELECT plan_id FROM plans ORDER BY created_at DESC LIMIT 1")
+        row = cur.fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def create_plan(self, plan_data: dict) -> str:
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        plan_id = self._insert_plan(cur, plan_data)
+        conn.commit()
+        conn.close()
+        return plan_id
+
+    def add_tasks(self, plan_id: str, tasks: list):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        self._insert_tasks(cur, plan_id, tasks)
+        conn.commit()
+        conn.close()
+
+    def _insert_plan(self, cur, plan_data: dict, plan_id=None) -> str:
+        plan_id = plan_id or str(uuid.uuid4())
+        cur.execute("""
+            INSERT INTO plans(plan_id, goal, start_date, end_date, duration_days,
+                              hours_per_week, preferred_days, intensity, learning_pref, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            plan_id,
+            plan_data["goal"],
+            plan_data["start_date"],
+            plan_data["end_date"],
+            plan_data["duration_days"],
+            plan_data["hours_per_week"],
+            plan_data["preferred_days"],
+            plan_data["intensity"],
+            plan_data["learning_pref"],
+            datetime.utcnow().isoformat()
+        ))
+        return plan_id
+
+    def _insert_tasks(self, cur, plan_id: str, tasks: list):
+        if self.compact:
+            cur.execute("INSERT OR IGNORE INTO plan_keys(plan_id) VALUES (?)", (plan_id,))
+            cur.execute("SELECT plan_no FROM plan_keys WHERE plan_id=?", (plan_id,))
+            plan_no = cur.fetchone()[0]
+            # task_id is left NULL so SQLite assigns the rowid.
+            cur.executemany("""
+                INSERT INTO tasks_compact(plan_no, task_day, week_no, title, details,
+                                          estimated_minutes, status, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                plan_no,
+                _to_epoch_day(t["task_date"]),
+                t["week_no"],
+                t["title"],
+                t["details"],
+                t["estimated_minutes"],
+                STATUS_CODES["pending"],
+                None
+            ) for t in tasks])
+        else:
+            cur.executemany("""
+                INSERT INTO tasks(task_id, plan_id, task_date, week_no, title, details,
+                                  estimated_minutes, status, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                str(uuid.uuid4()),
+                plan_id,
+                t["task_date"],
+                t["week_no"],
+                t["title"],
+                t["details"],
+                t["estimated_minutes"],
+                "pending",
+                None
+            ) for t in tasks])
+
+    def get_tasks_by_date(self, plan_id: str, date_str: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        if self.compact:
+            cur.execute("""
+                SELECT task_id, title, details, estimated_minutes, status
+                FROM tasks_compact
+                WHERE plan_no=(SELECT plan_no FROM plan_keys WHERE plan_id=?) AND task_day=?
+                ORDER BY week_no ASC, title ASC
+            """, (plan_id, _to_epoch_day(date_str)))
+            rows = [
+                (str(task_id), title, details, mins, STATUS_NAMES[status])
+                for task_id, title, details, mins, status in cur.fetchall()
+            ]
+        else:
+            cur.execute("""
+                SELECT task_id, title, details, estimated_minutes, status
+                FROM tasks
+                WHERE plan_id=? AND task_date=?
+                ORDER BY week_no ASC, title ASC
+            """, (plan_id, date_str))
+            rows = cur.fetchall()
+        conn.close()
+        return rows
+
+    def get_all_tasks(self, plan_id: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        if self.compact:
+            cur.execute("""
+                SELECT task_id, task_day, week_no, title, status
+                FROM tasks_compact
+                WHERE plan_no=(SELECT plan_no FROM plan_keys WHERE plan_id=?)
+                ORDER BY task_day ASC
+            """, (plan_id,))
+            rows = [
+                (str(task_id), _from_epoch_day(day), week_no, title, STATUS_NAMES[status])
+                for task_id, day, week_no, title, status in cur.fetchall()
+            ]
+        else:
+            cur.execute("""
+                SELECT task_id, task_date, week_no, title, status
+                FROM tasks
+                WHERE plan_id=?
+                ORDER BY task_date ASC
+            """, (plan_id,))
+            rows = cur.fetchall()
+        conn.close()
+        return rows
+
+    def update_task_status(self, task_id: str, status: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        if self.compact:
+            completed_at = int(datetime.now(timezone.utc).timestamp()) if status == "done" else None
+            cur.execute("""
+                UPDATE tasks_compact SET status=?, completed_at=?
+                WHERE task_id=?
+            """, (STATUS_CODES[status], completed_at, int(task_id)))
+        else:
+            completed_at = datetime.utcnow().isoformat() if status == "done" else None
+            cur.execute("""
+                UPDATE tasks SET status=?, completed_at=?
+                WHERE task_id=?
+            """, (status, completed_at, task_id))
+        conn.commit()
+        conn.close()
+
+    def get_progress_counts(self, plan_id: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        if self.compact:
+            cur.execute("""
+                SELECT COUNT(*), COALESCE(SUM(status=?), 0)
+                FROM tasks_compact WHERE plan_no=(SELECT plan_no FROM plan_keys WHERE plan_id=?)
+            """, (STATUS_CODES["done"], plan_id))
+            total, done = cur.fetchone()
+        else:
+            cur.execute("SELECT COUNT(*) FROM tasks WHERE plan_id=?", (plan_id,))
+            total = cur.fetchone()[0]
+            cur.execute("SELECT COUNT(*) FROM tasks WHERE plan_id=? AND status='done'", (plan_id,))
+            done = cur.fetchone()[0]
+        conn.close()
+        return total, done
+
+    def get_all_tasks_detailed(self, plan_id: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        if self.compact:
+            cur.execute("""
+                SELECT task_id, task_day, week_no, title, details, estimated_minutes, status
+                FROM tasks_compact
+                WHERE plan_no=(SELECT plan_no FROM plan_keys WHERE plan_id=?)
+                ORDER BY task_day ASC
+            """, (plan_id,))
+            rows = [
+                (str(task_id), _from_epoch_day(day), week_no, title, details, mins, STATUS_NAMES[status])
+                for task_id, day, week_no, title, details, mins, status in cur.fetchall()
+            ]
+        else:
+            cur.execute("""
+                SELECT task_id, task_date, week_no, title, details, estimated_minutes, status
+                FROM tasks
+                WHERE plan_id=?
+                ORDER BY task_date ASC
+            """, (plan_id,))
+            rows = cur.fetchall()
+        conn.close()
+        return rows
+
+    def create_job(self, idempotency_key: str, request_json: str, stale_before: datetime, done_before: datetime):
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        # The DELETE opens the write transaction, so the check-and-insert is atomic.
+        cur.execute("""
+            DELETE FROM jobs
+            WHERE idempotency_key=?
+              AND NOT (status IN ('queued', 'running') AND updated_at >= ?)
+              AND NOT (status='done' AND updated_at >= ?)
+        """, (idempotency_key, stale_before.isoformat(), done_before.isoformat()))
+        cur.execute("""
+            INSERT OR IGNORE INTO jobs(job_id, idempotency_key, status, stage, request, created_at, updated_at)
+            VALUES (?, ?, 'queued', 'Queued', ?, ?, ?)
+        """, (job_id, idempotency_key, request_json, now, now))
+        created = cur.rowcount == 1
+        if not created:
+            cur.execute("SELECT job_id FROM jobs WHERE idempotency_key=?", (idempotency_key,))
+            job_id = cur.fetchone()[0]
+        conn.commit()
+        conn.close()
+        return job_id, created
+
+    def get_job(self, job_id: str):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT job_id, status, stage, plan_id, planner_used, message, updated_at
+            FROM jobs WHERE job_id=?
+        """, (job_id,))
+        row = cur.fetchone()
+        conn.close()
+        if not row:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job["updated_at"] = datetime.fromisoformat(job["updated_at"])
+        return job
+
+    def update_job(self, job_id: str, status: str, stage: str, planner_used=None, message=None) -> bool:
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE jobs SET status=?, stage=?,
+                planner_used=COALESCE(?, planner_used),
+                message=COALESCE(?, message),
+                updated_at=?
+            WHERE job_id=? AND status IN ('queued', 'running')
+        """, (status, stage, planner_used, message, datetime.utcnow().isoformat(), job_id))
+        updated = cur.rowcount == 1
+        conn.commit()
+        conn.close()
+        return updated
+
+    def finish_plan_job(self, job_id: str, plan_data: dict, tasks: list, message=None):
+        conn = get_connection(self.db_name)
+        cur = conn.cursor()
+        plan_id = str(uuid.uuid4())
+        # Claim the job first: if it was reset or replaced meanwhile, write nothing.
+        cur.execute("""
+            UPDATE jobs SET status='done', stage='Done', plan_id=?,
+                message=COALESCE(?, message),
+                updated_at=?
+            WHERE job_id=? AND status IN ('queued', 'running')
+        """, (plan_id, message, datetime.utcnow().isoformat(), job_id))
+        if cur.rowcount != 1:
+            conn.rollback()
+            conn.close()
+            return None
+        self._insert_plan(cur, plan_data, plan_id)
+        self._insert_tasks(cur, plan_id, tasks)
+        conn.commit()
+        conn.close()
+        return plan_id
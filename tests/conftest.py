@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from storage_sqlite import SQLiteStorage
+
+# Point this at a throwaway database: the Postgres tests wipe it.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "").strip()
+
+
+@pytest.fixture(scope="session")
+def postgres_storage():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    pytest.importorskip("psycopg2")
+    from storage_postgres import PostgresStorage
+    backend = PostgresStorage(dsn=TEST_DATABASE_URL)
+    backend.init_db()
+    yield backend
+    backend.pool.closeall()
+
+
+@pytest.fixture(params=["sqlite", "sqlite-compact", "postgres"])
+def storage(request, tmp_path):
+    """Every backend the conformance tests run against, starting empty."""
+    if request.param == "postgres":
+        backend = request.getfixturevalue("postgres_storage")
+    else:
+        backend = SQLiteStorage(db_name=str(tmp_path / "study_plan.db"),
+                                compact=request.param == "sqlite-compact")
+        backend.init_db()
+    backend.reset_all_data()
+    return backend
@@ -0,0 +1,292 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+import storage as storage_module
+from storage_sqlite import SQLiteStorage
+
+REQUEST = {
+    "goal": "SQL",
+    "goal_type": "Skill/topic completion",
+    "start_date": "2026-01-05",
+    "duration_days": 14,
+    "hours_per_week": 5.0,
+    "preferred_days": ["Mon", "Wed", "Fri"],
+    "intensity": "moderate",
+    "learning_pref": "mixed",
+}
+
+AI_PLAN = {"weeks": [
+    {"week_no": 1, "milestone": "Queries", "subtopics": ["SELECT", "WHERE", "JOIN"]},
+    {"week_no": 2, "milestone": "Design", "subtopics": ["Keys", "Indexes", "Normal forms"]},
+]}
+
+
+def cutoffs(stale_before=None, done_before=None):
+    now = datetime.utcnow()
+    return (stale_before or now - timedelta(minutes=5), done_before or now - timedelta(seconds=10))
+
+
+def wait_for_job(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = storage_module.get_storage().get_job(job_id)
+        if job is None or job["status"] not in jobs.ACTIVE_JOB_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still running after {timeout}s")
+
+
+@pytest.fixture
+def backend(storage, monkeypatch):
+    """Route models.py (and so jobs.py) to the backend under test."""
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    return storage
+
+
+@pytest.fixture
+def hf_plan(monkeypatch):
+    calls = []
+
+    def fake_generate_plan_hf(*args, **kwargs):
+        calls.append(args)
+        return AI_PLAN
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", fake_generate_plan_hf)
+    return calls
+
+
+def queue_job(backend, request=REQUEST):
+    key = jobs.make_idempotency_key(request)
+    job_id, created = backend.create_job(key, "{}", *cutoffs())
+    assert created
+    return job_id
+
+
+def test_idempotency_key_ignores_dict_order():
+    reordered = dict(reversed(list(REQUEST.items())))
+    assert jobs.make_idempotency_key(reordered) == jobs.make_idempotency_key(REQUEST)
+
+
+def test_idempotency_key_changes_with_inputs():
+    changed = dict(REQUEST, duration_days=15)
+    assert jobs.make_idempotency_key(changed) != jobs.make_idempotency_key(REQUEST)
+
+
+def test_create_job_replaces_failed_job(backend):
+    job_id, _ = backend.create_job("k", "{}", *cutoffs())
+    backend.update_job(job_id, "failed", "Failed", message="boom")
+
+    retry, created = backend.create_job("k", "{}", *cutoffs())
+    assert created and retry != job_id
+    assert backend.get_job(job_id) is None
+
+
+def test_create_job_replaces_stale_job(backend):
+    job_id, _ = backend.create_job("k", "{}", *cutoffs())
+    backend.update_job(job_id, "running", "Generating plan with AI")
+
+    future = datetime.utcnow() + timedelta(minutes=1)
+    retry, created = backend.create_job("k", "{}", *cutoffs(stale_before=future))
+    assert created and retry != job_id
+
+
+def test_create_job_dedupes_done_job_only_inside_window(backend):
+    job_id, _ = backend.create_job("k", "{}", *cutoffs())
+    assert backend.finish_plan_job(job_id, {
+        "goal": "g", "start_date": "2026-01-05", "end_date": "2026-01-19", "duration_days": 14,
+        "hours_per_week": 5.0, "preferred_days": "Mon", "intensity": "light", "learning_pref": "mixed",
+    }, [])
+
+    assert backend.create_job("k", "{}", *cutoffs()) == (job_id, False)
+
+    future = datetime.utcnow() + timedelta(minutes=1)
+    fresh, created = backend.create_job("k", "{}", *cutoffs(done_before=future))
+    assert created and fresh != job_id
+
+
+def test_run_plan_job_uses_hf_plan(backend, hf_plan):
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    job = backend.get_job(job_id)
+    assert (job["status"], job["stage"], job["planner_used"], job["message"]) == ("done", "Done", "Hugging Face", None)
+    assert len(hf_plan) == 1
+    assert backend.get_latest_plan_id() == job["plan_id"]
+    titles = [row[3] for row in backend.get_all_tasks(job["plan_id"])]
+    assert len(titles) == 6
+    assert titles[0] == "Learn: SELECT"
+
+
+def test_run_plan_job_falls_back_when_hf_fails(backend, monkeypatch):
+    def failing_hf(*args, **kwargs):
+        raise RuntimeError("HF router error 503")
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", failing_hf)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    job = backend.get_job(job_id)
+    assert (job["status"], job["planner_used"], job["message"]) == ("done", "Fallback", "HF router error 503")
+    assert backend.get_progress_counts(job["plan_id"]) == (6, 0)
+
+
+def test_run_plan_job_records_failure(backend, monkeypatch):
+    def failing(*args, **kwargs):
+        raise RuntimeError("planner exploded")
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", failing)
+    monkeypatch.setattr(jobs, "generate_plan_fallback", failing)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    job = backend.get_job(job_id)
+    assert (job["status"], job["stage"], job["message"]) == ("failed", "Failed", "planner exploded")
+    assert job["plan_id"] is None
+    assert backend.get_latest_plan_id() is None
+
+
+def test_is_job_stalled(backend, monkeypatch):
+    job_id = queue_job(backend)
+    assert not jobs.is_job_stalled(backend.get_job(job_id))
+
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", -60)
+    assert jobs.is_job_stalled(backend.get_job(job_id))
+
+    backend.update_job(job_id, "failed", "Failed", message="boom")
+    assert not jobs.is_job_stalled(backend.get_job(job_id))
+
+
+def test_run_plan_job_retries_failure_update(backend, monkeypatch, caplog):
+    def failing(*args, **kwargs):
+        raise RuntimeError("planner exploded")
+
+    real_update_job = jobs.update_job
+    attempts = []
+
+    def flaky_update_job(job_id, status, *args, **kwargs):
+        if status == "failed":
+            attempts.append(status)
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+        return real_update_job(job_id, status, *args, **kwargs)
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", failing)
+    monkeypatch.setattr(jobs, "generate_plan_fallback", failing)
+    monkeypatch.setattr(jobs, "update_job", flaky_update_job)
+    monkeypatch.setattr(jobs, "JOB_FAILURE_RETRY_SECONDS", 0)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    assert len(attempts) == 2
+    assert "database is locked" in caplog.text
+    assert backend.get_job(job_id)["status"] == "failed"
+
+
+def test_run_plan_job_logs_when_failure_update_keeps_failing(backend, monkeypatch, caplog):
+    def failing(*args, **kwargs):
+        raise RuntimeError("planner exploded")
+
+    real_update_job = jobs.update_job
+
+    def broken_update_job(job_id, status, *args, **kwargs):
+        if status == "failed":
+            raise RuntimeError("database is locked")
+        return real_update_job(job_id, status, *args, **kwargs)
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", failing)
+    monkeypatch.setattr(jobs, "generate_plan_fallback", failing)
+    monkeypatch.setattr(jobs, "update_job", broken_update_job)
+    monkeypatch.setattr(jobs, "JOB_FAILURE_RETRY_SECONDS", 0)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    assert caplog.text.count(f"Could not mark job {job_id} as failed") == 2
+    # Still active in storage; the UI's stall check is what lets the user retry.
+    assert backend.get_job(job_id)["status"] == "running"
+
+
+def test_run_plan_job_writes_nothing_after_reset(backend, monkeypatch):
+    def reset_while_generating(*args, **kwargs):
+        backend.reset_all_data()
+        return AI_PLAN
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", reset_while_generating)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    assert backend.get_job(job_id) is None
+    assert backend.get_latest_plan_id() is None
+
+
+def test_replaced_stale_job_writes_nothing(backend, monkeypatch):
+    replacement = {}
+
+    def replaced_while_generating(*args, **kwargs):
+        future = datetime.utcnow() + timedelta(minutes=1)
+        replacement["job_id"], _ = backend.create_job(
+            jobs.make_idempotency_key(REQUEST), "{}", *cutoffs(stale_before=future))
+        return AI_PLAN
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", replaced_while_generating)
+    job_id = queue_job(backend)
+    jobs.run_plan_job(job_id, REQUEST)
+
+    assert backend.get_job(job_id) is None
+    assert backend.get_job(replacement["job_id"])["status"] == "queued"
+    assert backend.get_latest_plan_id() is None
+
+
+def test_queue_dedupes_in_flight_submissions(backend, monkeypatch):
+    release = threading.Event()
+
+    def slow_hf(*args, **kwargs):
+        release.wait(5)
+        return AI_PLAN
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", slow_hf)
+    queue = jobs.PlanJobQueue(max_workers=2)
+    try:
+        first = queue.submit(REQUEST)
+        assert queue.submit(REQUEST) == first
+        release.set()
+        assert wait_for_job(first)["status"] == "done"
+
+        # Once finished (and outside the dedupe window) the same inputs make a new plan.
+        monkeypatch.setattr(jobs, "JOB_DEDUPE_SECONDS", -1)
+        second = queue.submit(REQUEST)
+        assert second != first
+        assert wait_for_job(second)["status"] == "done"
+    finally:
+        queue.executor.shutdown(wait=True)
+
+
+def test_throughput_scales_with_workers(tmp_path, monkeypatch, record_property):
+    backend = SQLiteStorage(db_name=str(tmp_path / "study_plan.db"))
+    backend.init_db()
+    monkeypatch.setattr(storage_module, "_storage", backend)
+
+    def slow_hf(*args, **kwargs):
+        time.sleep(0.2)
+        return AI_PLAN
+
+    monkeypatch.setattr(jobs, "generate_plan_hf", slow_hf)
+
+    def run_batch(workers, batch):
+        queue = jobs.PlanJobQueue(max_workers=workers)
+        started = time.perf_counter()
+        job_ids = [queue.submit(dict(REQUEST, goal=f"{batch} topic {i}")) for i in range(8)]
+        statuses = [wait_for_job(job_id)["status"] for job_id in job_ids]
+        elapsed = time.perf_counter() - started
+        queue.executor.shutdown(wait=True)
+        assert statuses == ["done"] * 8
+        return elapsed
+
+    one_worker = run_batch(1, "serial")
+    four_workers = run_batch(4, "parallel")
+    record_property("one_worker_seconds", round(one_worker, 2))
+    record_property("four_workers_seconds", round(four_workers, 2))
+    assert four_workers < one_worker / 2
@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from storage_sqlite import SQLiteStorage
+
+PLAN = {
+    "goal": "SQL (Certification)",
+    "start_date": "2026-01-05",
+    "end_date": "2026-01-19",
+    "duration_days": 14,
+    "hours_per_week": 5.0,
+    "preferred_days": "Mon,Wed,Fri",
+    "intensity": "moderate",
+    "learning_pref": "mixed",
+}
+
+
+def make_tasks(count, start="2026-01-05"):
+    first = date.fromisoformat(start)
+    return [{
+        "task_date": (first + timedelta(days=i % 14)).isoformat(),
+        "week_no": (i % 14) // 7 + 1,
+        "title": f"Learn: topic {i}",
+        "details": "Learn concepts + make short notes.",
+        "estimated_minutes": 75,
+    } for i in range(count)]
+
+
+def test_init_db_is_idempotent(storage):
+    storage.init_db()
+    storage.init_db()
+    assert storage.get_latest_plan_id() is None
+
+
+def test_create_plan_becomes_latest(storage):
+    first = storage.create_plan(PLAN)
+    second = storage.create_plan(PLAN)
+    assert isinstance(first, str) and first != second
+    assert storage.get_latest_plan_id() == second
+
+
+def test_get_all_tasks_row_shape(storage):
+    plan_id = storage.create_plan(PLAN)
+    storage.add_tasks(plan_id, make_tasks(6))
+
+    rows = storage.get_all_tasks(plan_id)
+    assert len(rows) == 6
+    for task_id, task_date, week_no, title, status in rows:
+        assert isinstance(task_id, str)
+        assert date.fromisoformat(task_date).isoformat() == task_date
+        assert isinstance(week_no, int)
+        assert title.startswith("Learn: topic")
+        assert status == "pending"
+    assert [r[1] for r in rows] == sorted(r[1] for r in rows)
+
+
+def test_get_all_tasks_detailed_row_shape(storage):
+    plan_id = storage.create_plan(PLAN)
+    storage.add_tasks(plan_id, make_tasks(3))
+
+    rows = storage.get_all_tasks_detailed(plan_id)
+    assert [row[1:] for row in rows] == [
+        ("2026-01-05", 1, "Learn: topic 0", "Learn concepts + make short notes.", 75, "pending"),
+        ("2026-01-06", 1, "Learn: topic 1", "Learn concepts + make short notes.", 75, "pending"),
+        ("2026-01-07", 1, "Learn: topic 2", "Learn concepts + make short notes.", 75, "pending"),
+    ]
+    assert [row[0] for row in rows] == [row[0] for row in storage.get_all_tasks(plan_id)]
+
+
+def test_get_tasks_by_date_filters_and_orders(storage):
+    plan_id = storage.create_plan(PLAN)
+    storage.add_tasks(plan_id, [
+        {"task_date": "2026-01-05", "week_no": 1, "title": "B task", "details": "", "estimated_minutes": 55},
+        {"task_date": "2026-01-05", "week_no": 1, "title": "A task", "details": "d", "estimated_minutes": 55},
+        {"task_date": "2026-01-06", "week_no": 1, "title": "Other day", "details": "", "estimated_minutes": 55},
+    ])
+
+    rows = storage.get_tasks_by_date(plan_id, "2026-01-05")
+    assert [row[1:] for row in rows] == [
+        ("A task", "d", 55, "pending"),
+        ("B task", "", 55, "pending"),
+    ]
+    assert all(isinstance(row[0], str) for row in rows)
+    assert storage.get_tasks_by_date(plan_id, "2026-02-01") == []
+
+
+def test_task_text_round_trips(storage):
+    plan_id = storage.create_plan(PLAN)
+    title = 'Practice: "joins", commas, tabs\tand\nnewlines \\ backslash'
+    storage.add_tasks(plan_id, [
+        {"task_date": "2026-01-05", "week_no": 1, "title": title, "details": None, "estimated_minutes": 55},
+    ])
+    _, _, _, got_title, details, _, _ = storage.get_all_tasks_detailed(plan_id)[0]
+    assert got_title == title
+    assert details is None
+
+
+def test_update_task_status_round_trip(storage):
+    plan_id = storage.create_plan(PLAN)
+    storage.add_tasks(plan_id, make_tasks(4))
+    task_id = storage.get_all_tasks(plan_id)[2][0]
+
+    storage.update_task_status(task_id, "done")
+    statuses = {row[0]: row[4] for row in storage.get_all_tasks(plan_id)}
+    assert statuses[task_id] == "done"
+    assert sorted(statuses.values()) == ["done", "pending", "pending", "pending"]
+
+    storage.update_task_status(task_id, "pending")
+    assert all(row[4] == "pending" for row in storage.get_all_tasks(plan_id))
+
+
+def test_get_progress_counts(storage):
+    plan_id = storage.create_plan(PLAN)
+    assert storage.get_progress_counts(plan_id) == (0, 0)
+
+    storage.add_tasks(plan_id, make_tasks(5))
+    for task_id, *_ in storage.get_all_tasks(plan_id)[:2]:
+        storage.update_task_status(task_id, "done")
+    assert storage.get_progress_counts(plan_id) == (5, 2)
+
+
+def test_tasks_are_scoped_to_their_plan(storage):
+    plan_a = storage.create_plan(PLAN)
+    plan_b = storage.create_plan(PLAN)
+    storage.add_tasks(plan_a, make_tasks(3))
+    storage.add_tasks(plan_b, make_tasks(2))
+
+    assert len(storage.get_all_tasks(plan_a)) == 3
+    assert storage.get_progress_counts(plan_b) == (2, 0)
+
+
+def test_reset_all_data(storage):
+    plan_id = storage.create_plan(PLAN)
+    storage.add_tasks(plan_id, make_tasks(3))
+    now = datetime.utcnow()
+    storage.create_job("key", "{}", now - timedelta(minutes=5), now - timedelta(seconds=10))
+
+    storage.reset_all_data()
+    assert storage.get_latest_plan_id() is None
+    assert storage.get_all_tasks(plan_id) == []
+
+
+def test_create_job_dedupes_active_job(storage):
+    now = datetime.utcnow()
+    cutoffs = (now - timedelta(minutes=5), now - timedelta(seconds=10))
+    job_id, created = storage.create_job("same-inputs", '{"goal": "SQL"}', *cutoffs)
+    again, created_again = storage.create_job("same-inputs", '{"goal": "SQL"}', *cutoffs)
+
+    assert created and not created_again
+    assert again == job_id
+    job = storage.get_job(job_id)
+    assert now - timedelta(seconds=1) <= job.pop("updated_at") <= datetime.utcnow()
+    assert job == {
+        "job_id": job_id, "status": "queued", "stage": "Queued",
+        "plan_id": None, "planner_used": None, "message": None,
+    }
+
+
+def test_bulk_insert_and_query_timing(storage, record_property):
+    tasks = make_tasks(20000)
+    plan_id = storage.create_plan(PLAN)
+
+    started = time.perf_counter()
+    storage.add_tasks(plan_id, tasks)
+    insert_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = storage.get_all_tasks_detailed(plan_id)
+    total, _ = storage.get_progress_counts(plan_id)
+    day_rows = storage.get_tasks_by_date(plan_id, "2026-01-05")
+    query_seconds = time.perf_counter() - started
+
+    record_property("insert_20k_seconds", round(insert_seconds, 3))
+    record_property("query_20k_seconds", round(query_seconds, 3))
+    assert len(rows) == total == 20000
+    assert len(day_rows) == 20000 // 14 + 1
+    # Generous ceilings: these catch per-row round trips, not small regressions.
+    assert insert_seconds < 10
+    assert query_seconds < 5
+
+
+def test_postgres_pool_waits_for_free_connection(postgres_storage):
+    from storage_postgres import PostgresStorage
+    backend = PostgresStorage(dsn=os.environ["TEST_DATABASE_URL"], minconn=1, maxconn=2)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = list(executor.map(lambda _: backend.get_progress_counts("no-such-plan"), range(40)))
+        assert counts == [(0, 0)] * 40
+    finally:
+        backend.pool.closeall()
+
+
+def completed_at_by_title(db_name):
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("""
+        SELECT title, completed_at FROM tasks
+        UNION ALL
+        SELECT title, completed_at FROM tasks_compact
+    """).fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def test_sqlite_layout_migration_round_trip(tmp_path):
+    db_name = str(tmp_path / "study_plan.db")
+    text = SQLiteStorage(db_name=db_name, compact=False)
+    text.init_db()
+    plan_a = text.create_plan(PLAN)
+    plan_b = text.create_plan(PLAN)
+    text.add_tasks(plan_a, make_tasks(3))
+    text.add_tasks(plan_b, [dict(t, title=f"Plan B task {i}") for i, t in enumerate(make_tasks(2, start="2026-02-02"))])
+    text.update_task_status(text.get_all_tasks(plan_a)[1][0], "done")
+
+    def snapshot(backend):
+        return {
+            plan_id: ([row[1:] for row in backend.get_all_tasks_detailed(plan_id)],
+                      backend.get_progress_counts(plan_id))
+            for plan_id in (plan_a, plan_b)
+        }
+
+    before = snapshot(text)
+    assert before[plan_a][1] == (3, 1) and before[plan_b][1] == (2, 0)
+    done_at = completed_at_by_title(db_name)["Learn: topic 1"]
+
+    compact = SQLiteStorage(db_name=db_name, compact=True)
+    compact.init_db()
+    assert snapshot(compact) == before
+    assert completed_at_by_title(db_name)["Learn: topic 1"] == int(
+        datetime.fromisoformat(done_at).replace(tzinfo=timezone.utc).timestamp())
+
+    text.init_db()
+    assert snapshot(text) == before
+    completed = completed_at_by_title(db_name)
+    assert completed["Learn: topic 1"] == done_at.split(".")[0]
+    assert completed["Learn: topic 0"] is None
+
+    conn = sqlite3.connect(db_name)
+    assert conn.execute("SELECT COUNT(*) FROM tasks_compact").fetchone() == (0,)
+    conn.close()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_sqlite_init_db_skips_writes_when_nothing_to_migrate(tmp_path, compact):
+    db_name = str(tmp_path / "study_plan.db")
+    backend = SQLiteStorage(db_name=db_name, compact=compact)
+    backend.init_db()
+    backend.add_tasks(backend.create_plan(PLAN), make_tasks(2))
+
+    writer = sqlite3.connect(db_name)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        backend.init_db()
+        assert time.perf_counter() - started < 1
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_postgres_init_db_does_not_wait_on_task_writes(postgres_storage):
+    import psycopg2
+    from storage_postgres import PostgresStorage
+    writer = psycopg2.connect(os.environ["TEST_DATABASE_URL"])
+    backend = PostgresStorage(dsn=os.environ["TEST_DATABASE_URL"], minconn=1, maxconn=2)
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        # An in-flight COPY/UPDATE holds ROW EXCLUSIVE on tasks until commit.
+        writer.cursor().execute("LOCK TABLE tasks IN ROW EXCLUSIVE MODE")
+        executor.submit(backend.init_db).result(timeout=2)
+        assert backend.initialized
+    finally:
+        writer.rollback()
+        writer.close()
+        executor.shutdown(wait=True)
+        backend.pool.closeall()